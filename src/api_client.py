@@ -1,9 +1,33 @@
-import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
+import threading
+import time
+from collections import OrderedDict
+
+import json_utils
 
 logger = logging.getLogger("QueryBuilder")
 
+class _LoggingRetry(Retry):
+    """Retry policy that logs each retry attempt and caps server-requested waits"""
+    # Longest Retry-After wait honoured, in seconds; queries run on a pool
+    # worker that can't be cancelled, so a long wait would hang the Run button
+    MAX_RETRY_AFTER = 5.0
+    
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.MAX_RETRY_AFTER)
+    
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        new_retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        reason = error or (response.status if response is not None else "unknown")
+        logger.info("Retrying %s %s (attempt %d): %s", method, url, len(new_retry.history), reason)
+        return new_retry
+
 class ApiClient:
     def __init__(self, api_base_url):
         """
@@ -13,9 +37,52 @@ class ApiClient:
             api_base_url (str): Base URL for the API
         """
         self.api_base_url = api_base_url
+        
+        # Reuse pooled keep-alive connections instead of reconnecting per query.
+        # Only failures to connect are retried here: once a request reached the
+        # server, re-posting could run a write query twice. That includes gateway
+        # errors, since the backend may already have run the query.
+        self.session = self._make_session(_LoggingRetry(
+            total=3,
+            connect=3,
+            read=0,
+            status=0,
+            backoff_factor=0.5,
+            backoff_jitter=0.5,
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False
+        ))
+        # Read-only queries are safe to repeat, so their session also retries
+        # transient gateway/throttling statuses with jittered exponential backoff.
+        # Exhausted retries hand back the last response so the normal status
+        # handling reports it.
+        self.read_session = self._make_session(_LoggingRetry(
+            total=3,
+            connect=3,
+            read=0,
+            status=3,
+            backoff_factor=0.5,
+            backoff_jitter=0.5,
+            backoff_max=_LoggingRetry.MAX_RETRY_AFTER,
+            status_forcelist=(408, 429, 502, 503, 504),
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False,
+            respect_retry_after_header=True
+        ))
+        
+        # LRU cache of raw response bodies for read-only queries, keyed by query and
+        # config. Bodies are re-parsed on a hit so callers never share result objects.
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_max = 128
+        self._cache_ttl = 60.0
+        self._cache_max_bytes = 1_000_000
+        
+        # Larger responses are refused before they are buffered and parsed
+        self.max_response_bytes = 32 * 1024 * 1024
         logger.info(f"API client initialized with base URL: {api_base_url}")
     
-    def execute_query(self, query, db_config, read_only=True):
+    def execute_query(self, query, db_config, read_only=True, *, log_full_body=False):
         """
         Execute a database query via the API.
         
@@ -23,6 +90,8 @@ class ApiClient:
             query (str): The query to execute
             db_config (dict): Database configuration
             read_only (bool): Whether the query is read-only
+            log_full_body (bool): Log response headers and the full body at INFO
+                and bypass the result cache, for troubleshooting
             
         Returns:
             dict: Query results
@@ -34,56 +103,72 @@ class ApiClient:
         try:
             # Process query for PostgreSQL table name substitution
             processed_query = query
-            if db_config["type"] == "postgres" and "{table_name}" in query:
+            if db_config["type"] == "postgres":
                 # PostgreSQL doesn't support curly brace syntax directly
-                # Replace {table_name} with properly quoted table name
+                # Replace {table_name} with properly quoted table name; a single
+                # replace scans once and is a no-op when the placeholder is absent
                 table_name = db_config.get("tableName", "")
                 processed_query = query.replace("{table_name}", f'"{table_name}"')
-                logger.info(f"Processed PostgreSQL query with table name substitution: {table_name}")
+                logger.debug("Applied PostgreSQL table name substitution: %s", table_name)
+            
+            cache_key = None
+            if read_only and not log_full_body:
+                cache_key = (processed_query, tuple(sorted(db_config.items())))
+                cached = self._cache_get(cache_key)
+                if cached is not None:
+                    logger.info("Returning cached result for read-only query")
+                    return json_utils.loads(cached)
             
             # API endpoint for query execution
             api_url = f"{self.api_base_url}/api/queries/execute"
-            logger.info(f"Sending request to API: {api_url}")
-            
-            # Prepare the database configuration to send
-            config_to_send = db_config.copy()
             
-            # Prepare the request payload
+            # Prepare the request payload; db_config is only read during encoding
             payload = {
                 "query": processed_query,
-                "dbConfig": config_to_send,
+                "dbConfig": db_config,
                 "readOnly": read_only
             }
             
-            # Make the API request with proper headers
-            headers = {
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            }
-            
-            # Log the request for debugging
-            logger.debug(f"Request payload: {json.dumps(payload, indent=2)}")
-            
-            # Add more detailed logging
-            logger.info(f"Sending request to: {api_url}")
-            logger.info(f"Payload: {json.dumps(payload, indent=2)}")
+            # Log the request for debugging; %-style args are only formatted if enabled
+            logger.log(logging.INFO if log_full_body else logging.DEBUG, "Request payload: %s", payload)
             
-            response = requests.post(api_url, json=payload, headers=headers, timeout=30)
-            logger.info(f"API response status code: {response.status_code}")
+            # Encode compactly ourselves; the session already sends the JSON content type
+            body = json_utils.dumps(payload)
+            # One INFO record per phase keeps per-query logging to two file writes
+            logger.info("Sending request to API: %s (%d bytes, read-only: %s)", api_url, len(body), read_only)
+            session = self.read_session if read_only else self.session
+            response = session.post(api_url, data=body, timeout=(3.05, 30), stream=True)
+            with response:
+                content = self._read_content(response)
             
-            # Log full response for debugging
-            logger.info(f"API response headers: {dict(response.headers)}")
-            logger.info(f"API response content: {response.text[:500]}...")  # Log first 500 chars to avoid huge logs
+            # Log response details for debugging
+            if log_full_body:
+                logger.info("API response headers: %s", response.headers)
+                logger.info("API response content (full): %s", content.decode(response.encoding or "utf-8", errors="replace"))
+            elif logger.isEnabledFor(logging.DEBUG):
+                logger.debug("API response headers: %s", response.headers)
+                # Decode only the first 500 bytes rather than the whole body
+                preview = content[:500].decode(response.encoding or "utf-8", errors="replace")
+                logger.debug("API response content (first 500 bytes): %s...", preview)
             
             if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Query returned {len(data.get('data', [])) if isinstance(data, dict) and 'data' in data else 0} results")
-                logger.info(f"Response data type: {type(data)}")
+                data = json_utils.loads(content)
+                if cache_key is not None and len(content) <= self._cache_max_bytes:
+                    self._cache_put(cache_key, content)
                 if isinstance(data, dict):
-                    logger.info(f"Response data keys: {list(data.keys())}")
+                    logger.info(
+                        "API response: status %s, %d bytes, %d results, keys %s",
+                        response.status_code, len(content), len(data.get("data", [])), list(data)
+                    )
+                else:
+                    logger.info(
+                        "API response: status %s, %d bytes, %s payload",
+                        response.status_code, len(content), type(data).__name__
+                    )
                 return data
             else:
-                error_message = f"API Error ({response.status_code}): {response.text}"
+                text = content.decode(response.encoding or "utf-8", errors="replace")
+                error_message = f"API Error ({response.status_code}): {text}"
                 logger.error(f"API error: {error_message}")
                 raise Exception(error_message)
                 
@@ -91,6 +176,88 @@ class ApiClient:
             error_message = f"Connection Error: {str(e)}"
             logger.error(f"Connection error: {error_message}", exc_info=True)
             raise
+        finally:
+            # A write may have changed any cached result, whether or not it succeeded
+            if not read_only:
+                self.invalidate_cache()
+    
+    def _make_session(self, retry):
+        """
+        Create a JSON session with pooled connections and the given retry policy.
+        
+        Args:
+            retry (Retry): Retry policy mounted for http and https
+            
+        Returns:
+            requests.Session: The configured session
+        """
+        session = requests.Session()
+        session.headers.update({
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        })
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+    
+    def _read_content(self, response):
+        """
+        Read a streamed response body, refusing bodies over max_response_bytes.
+        
+        Args:
+            response (requests.Response): Response opened with stream=True
+            
+        Returns:
+            bytes: The response body
+            
+        Raises:
+            Exception: If the body is larger than max_response_bytes
+        """
+        length = int(response.headers.get("Content-Length") or 0)
+        if length > self.max_response_bytes:
+            raise Exception(f"Response too large: {length} bytes (limit {self.max_response_bytes})")
+        
+        # Content-Length can be missing (chunked) or wrong, so also count while reading
+        chunks = []
+        total = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            total += len(chunk)
+            if total > self.max_response_bytes:
+                raise Exception(f"Response too large: over {self.max_response_bytes} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+    
+    def _cache_get(self, key):
+        """Return the cached body for key, or None if missing or expired"""
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            stored_at, body = entry
+            if time.monotonic() - stored_at > self._cache_ttl:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return body
+    
+    def _cache_put(self, key, body):
+        """Store a response body, evicting the least recently used entries"""
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic(), body)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_max:
+                self._cache.popitem(last=False)
+    
+    def invalidate_cache(self):
+        """Drop all cached query results."""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def close(self):
+        """Close the pooled connections held by both sessions."""
+        self.session.close()
+        self.read_session.close()
     
     def run_test_query(self):
         """
@@ -114,48 +281,9 @@ class ApiClient:
             "tableName": ""
         }
         
-        # API endpoint for query execution
-        api_url = f"{self.api_base_url}/api/queries/execute"
-        logger.info(f"Sending test request to API: {api_url}")
-        
-        # Prepare the request payload
-        payload = {
-            "query": test_query,
-            "dbConfig": test_config,
-            "readOnly": True
-        }
-        
-        # Make the API request with proper headers
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
-        
         try:
-            # Log the request for debugging
-            logger.info(f"Test payload: {json.dumps(payload, indent=2)}")
-            
-            response = requests.post(api_url, json=payload, headers=headers, timeout=30)
-            logger.info(f"Test API response status code: {response.status_code}")
-            
-            # Log full response for debugging
-            logger.info(f"Test API response headers: {dict(response.headers)}")
-            logger.info(f"Test API response content (full): {response.text}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Test query response data type: {type(data)}")
-                logger.info(f"Test query response data: {data}")
-                
-                if isinstance(data, dict):
-                    logger.info(f"Test query response data keys: {list(data.keys())}")
-                    
-                return data
-            else:
-                error_message = f"API Error ({response.status_code}): {response.text}"
-                logger.error(f"Test API error: {error_message}")
-                raise Exception(error_message)
-                
+            # Same request path as real queries, with the full exchange logged
+            return self.execute_query(test_query, test_config, True, log_full_body=True)
         except Exception as e:
             error_message = f"Test Connection Error: {str(e)}"
             logger.error(f"Test connection error: {error_message}", exc_info=True)
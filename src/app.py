@@ -1,7 +1,8 @@
 import sys
-import json
 import os
+import functools
 import pathlib
+import shutil
 from datetime import datetime
 from dotenv import load_dotenv
 from PyQt6.QtWidgets import (
@@ -10,18 +11,39 @@ from PyQt6.QtWidgets import (
     QTabWidget, QTableWidget, QTableWidgetItem, QSplitter, QMessageBox,
     QGroupBox, QScrollArea, QGridLayout, QToolButton, QMenu, QFileDialog
 )
-from PyQt6.QtCore import Qt, QSize
+from PyQt6.QtCore import Qt, QSize, QTimer, QThreadPool
 from PyQt6.QtGui import QFont, QIcon, QColor, QAction
 import logging
 
-from template_manager import TemplateManagerDialog
 from query_history import QueryHistoryDialog, QueryHistoryManager
 from data_visualizer import DataVisualizer
 from api_client import ApiClient
 from db_manager import DbManager
+from query_worker import ApiWorker, QueryWorker
+import json_utils
+from logger import flush_logs
 
 logger = logging.getLogger("QueryBuilder")
 
+# Fonts shared by the main window, built once on first use; GUI objects
+# must not be created before the QApplication exists
+@functools.cache
+def _header_font():
+    font = QFont()
+    font.setPointSize(18)
+    font.setBold(True)
+    return font
+
+@functools.cache
+def _subtitle_font():
+    font = QFont()
+    font.setPointSize(10)
+    return font
+
+@functools.cache
+def _mono_font():
+    return QFont("Courier New", 10)
+
 class QueryBuilder(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -45,14 +67,36 @@ class QueryBuilder(QMainWindow):
         # Initialize components
         self.db_manager = DbManager()
         self.api_client = ApiClient(self.api_base_url)
+        self.history_manager = QueryHistoryManager()
+        
+        # API calls run on a small dedicated pool so they can't pile up or
+        # open more sockets than the HTTP adapter pools
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(4)
+        
+        # Text edits arrive per keystroke; apply them to the config once typing pauses
+        self._config_apply_timer = QTimer(self)
+        self._config_apply_timer.setSingleShot(True)
+        self._config_apply_timer.setInterval(250)
+        self._config_apply_timer.timeout.connect(self._apply_config_edits)
         
         # Initialize state
-        self.query = ""
         self.results = None
         self.loading = False
         self.error = None
         self.read_only = True
         
+        # Result paging: the visualizer only ever receives one page of rows
+        self._full_results = []
+        self._page = 0
+        self._page_size = 500
+        self._show_all = False
+        
+        # Dialogs are built on first use and kept for reuse
+        self._templates_dialog = None
+        self._history_dialog = None
+        self._msgbox = None
+        
         # Setup UI
         self.init_ui()
         
@@ -66,17 +110,12 @@ class QueryBuilder(QMainWindow):
         
         # Header
         header = QLabel("Query Builder")
-        header_font = QFont()
-        header_font.setPointSize(18)
-        header_font.setBold(True)
-        header.setFont(header_font)
+        header.setFont(_header_font())
         main_layout.addWidget(header)
         
         # Subtitle
         subtitle = QLabel("Build and execute database queries with ease")
-        subtitle_font = QFont()
-        subtitle_font.setPointSize(10)
-        subtitle.setFont(subtitle_font)
+        subtitle.setFont(_subtitle_font())
         main_layout.addWidget(subtitle)
         
         # Main content splitter
@@ -98,10 +137,9 @@ class QueryBuilder(QMainWindow):
         self.db_type_combo.addItems(["PostgreSQL", "MySQL", "MongoDB"])
         
         # Set initial selection
-        for display_name, internal_value in self.db_manager.db_type_map.items():
-            if internal_value == self.db_manager.db_config["type"]:
-                self.db_type_combo.setCurrentText(display_name)
-                break
+        display_name = self.db_manager.get_display_name()
+        if display_name:
+            self.db_type_combo.setCurrentText(display_name)
                 
         self.db_type_combo.currentTextChanged.connect(self.on_db_type_changed)
         
@@ -152,8 +190,7 @@ class QueryBuilder(QMainWindow):
         
         self.query_editor = QTextEdit()
         self.query_editor.setPlaceholderText("Enter your SQL query here...")
-        self.query_editor.setFont(QFont("Courier New", 10))
-        self.query_editor.textChanged.connect(self.on_query_changed)
+        self.query_editor.setFont(_mono_font())
         
         query_layout.addWidget(self.query_editor)
         
@@ -198,6 +235,27 @@ class QueryBuilder(QMainWindow):
         self.data_visualizer = DataVisualizer()
         results_layout.addWidget(self.data_visualizer)
         
+        # Page controls
+        page_controls = QHBoxLayout()
+        self.prev_page_button = QPushButton("Prev")
+        self.prev_page_button.clicked.connect(lambda: self._change_page(-1))
+        self.next_page_button = QPushButton("Next")
+        self.next_page_button.clicked.connect(lambda: self._change_page(1))
+        self.page_label = QLabel()
+        self.show_all_button = QPushButton()
+        self.show_all_button.clicked.connect(self._show_all_rows)
+        self.back_to_pages_button = QPushButton("Back to pages")
+        self.back_to_pages_button.clicked.connect(self._back_to_pages)
+        
+        page_controls.addWidget(self.show_all_button)
+        page_controls.addWidget(self.back_to_pages_button)
+        page_controls.addStretch()
+        page_controls.addWidget(self.prev_page_button)
+        page_controls.addWidget(self.page_label)
+        page_controls.addWidget(self.next_page_button)
+        results_layout.addLayout(page_controls)
+        self._update_page_controls()
+        
         right_layout.addWidget(results_group)
         
         # Add panels to splitter
@@ -231,35 +289,73 @@ class QueryBuilder(QMainWindow):
         self.conn_input.setPlaceholderText(self.db_manager.get_connection_placeholder())
     
     def on_table_name_changed(self, text):
-        self.db_manager.update_table_name(text)
+        self._config_apply_timer.start()
     
     def on_connection_changed(self, text):
-        self.db_manager.update_connection_string(text)
+        self._config_apply_timer.start()
     
-    def on_query_changed(self):
-        self.query = self.query_editor.toPlainText()
+    def _apply_config_edits(self):
+        self._config_apply_timer.stop()
+        db_config = self.db_manager.db_config
+        changed = False
+        table_name = self.table_name_input.text()
+        if table_name != db_config.get("tableName"):
+            self.db_manager.update_table_name(table_name)
+            changed = True
+        connection_string = self.conn_input.text()
+        if connection_string != db_config.get("url"):
+            self.db_manager.update_connection_string(connection_string)
+            changed = True
+        if changed:
+            # Cached results may belong to the old table or database
+            self.api_client.invalidate_cache()
+    
+    def closeEvent(self, event):
+        # Don't lose edits still waiting on the debounce timers
+        if self._config_apply_timer.isActive():
+            self._apply_config_edits()
+        self.db_manager.flush_config(wait=True)
+        self.history_manager.flush(wait=True)
+        self.api_client.close()
+        super().closeEvent(event)
+    
+    @property
+    def query(self):
+        # Pulled from the editor on demand rather than mirrored on every keystroke
+        return self.query_editor.toPlainText()
     
     def on_read_only_changed(self, state):
         self.read_only = state == Qt.CheckState.Checked
     
     def handle_query_submit(self):
-        if not self.query.strip():
-            QMessageBox.warning(self, "Empty Query", "Please enter a query to execute.")
+        # Refuse repeat submits while a query is in flight
+        if self.loading:
+            self._notify(QMessageBox.Icon.Information, "Busy", "A query is already running.")
+            return
+        
+        # Apply table/connection edits the debounce timer hasn't picked up yet
+        if self._config_apply_timer.isActive():
+            self._apply_config_edits()
+        
+        query = self.query
+        if not query.strip():
+            self._notify(QMessageBox.Icon.Warning, "Empty Query", "Please enter a query to execute.")
             logger.warning("Query submission attempted with empty query")
             return
         
+        db_config = self.db_manager.db_config
+        
         # Check if query contains {table_name} but no tableName is set
-        if "{table_name}" in self.query and not self.db_manager.db_config.get("tableName"):
-            QMessageBox.warning(
-                self, 
+        if "{table_name}" in query and not db_config.get("tableName"):
+            self._notify(
+                QMessageBox.Icon.Warning,
                 "Table Name Required", 
                 "Table name is required when using {table_name} placeholders."
             )
             logger.warning("Query with {table_name} placeholder attempted without table name set")
             return
         
-        logger.info(f"Executing query for database type: {self.db_manager.db_config['type']}")
-        logger.info(f"Read-only mode: {self.read_only}")
+        logger.info("Executing query for database type: %s, read-only mode: %s", db_config["type"], self.read_only)
         
         self.loading = True
         self.run_button.setEnabled(False)
@@ -267,36 +363,47 @@ class QueryBuilder(QMainWindow):
         self.error = None
         
         # Clear previous results
+        self._full_results = []
+        self._page = 0
+        self._show_all = False
+        self._update_page_controls()
         self.data_visualizer.set_data(None)
         
+        # Execute the query via API on a pool thread; results come back as signals
+        worker = QueryWorker(
+            self.api_client,
+            self.history_manager,
+            query,
+            dict(db_config),
+            self.read_only
+        )
+        worker.signals.finished.connect(self._on_query_finished)
+        worker.signals.failed.connect(self._on_query_failed)
+        self.pool.start(worker)
+    
+    def _on_query_finished(self, data):
         try:
-            # Execute the query via API
-            data = self.api_client.execute_query(
-                self.query, 
-                self.db_manager.db_config, 
-                self.read_only
-            )
-            
             # Display the results
             self.display_results(data)
-            
-            # Only save to history if no error occurred
-            if not self.error:
-                history_manager = QueryHistoryManager()
-                history_manager.add_query(self.query, self.db_manager.db_config["type"])
-                logger.info("Query executed successfully and saved to history")
-        except Exception as e:
-            self.error = str(e)
-            logger.error(f"Error executing query: {self.error}", exc_info=True)
-            QMessageBox.critical(self, "Query Error", f"Error executing query: {self.error}")
+            logger.info("Query executed successfully and saved to history")
+        finally:
+            self._finish_query()
+    
+    def _on_query_failed(self, error):
+        self.error = error
+        try:
+            self._notify(QMessageBox.Icon.Critical, "Query Error", f"Error executing query: {self.error}")
             
             # For demonstration purposes, show mock data when API is not available
             logger.info("Showing mock data due to connection error")
             self.display_mock_results()
         finally:
-            self.loading = False
-            self.run_button.setEnabled(True)
-            self.run_button.setText("Run Query")
+            self._finish_query()
+    
+    def _finish_query(self):
+        self.loading = False
+        self.run_button.setEnabled(True)
+        self.run_button.setText("Run Query")
     
     def display_mock_results(self):
         mock_data = [
@@ -321,12 +428,23 @@ class QueryBuilder(QMainWindow):
         if not actual_data or (isinstance(actual_data, list) and len(actual_data) == 0):
             self.data_visualizer.set_data(None)
             logger.info("Query executed successfully but returned no data")
-            QMessageBox.information(self, "Query Result", "Query executed successfully, but returned no data.")
+            self._notify(QMessageBox.Icon.Information, "Query Result", "Query executed successfully, but returned no data.")
             return
         
         # Use the data visualizer to display the results
-        logger.info(f"Sending data to visualizer: {type(actual_data)}, sample: {str(actual_data)[:200]}...")
-        self.data_visualizer.set_data(actual_data)
+        # Only stringify the first rows for the log preview, not the whole result
+        sample = actual_data[:3] if isinstance(actual_data, list) else actual_data
+        logger.info(f"Sending data to visualizer: {type(actual_data)}, sample: {str(sample)[:200]}...")
+        if isinstance(actual_data, list):
+            # Keep the full result here and hand the visualizer one page at a time
+            self._full_results = actual_data
+            self._page = 0
+            self._show_all = False
+            if len(actual_data) > self._page_size:
+                logger.info(f"Rendering {self._page_size} of {len(actual_data)} rows per page")
+            self._render_page()
+        else:
+            self.data_visualizer.set_data(actual_data)
         
         # Calculate row count based on data type
         if isinstance(actual_data, list):
@@ -339,26 +457,72 @@ class QueryBuilder(QMainWindow):
         logger.info(f"Displayed {row_count} rows of data in the visualizer")
         
         # Show success message
-        QMessageBox.information(
-            self, 
+        self._notify(
+            QMessageBox.Icon.Information,
             "Query Success", 
             f"Query executed successfully. Returned {row_count} rows."
         )
     
+    def _page_count(self):
+        return max(1, -(-len(self._full_results) // self._page_size))
+    
+    def _update_page_controls(self):
+        page_count = self._page_count()
+        if self._show_all:
+            self.page_label.setText(f"Chart covers all {len(self._full_results)} rows")
+        else:
+            self.page_label.setText(f"Page {self._page + 1} of {page_count}")
+        # While charting all rows the table isn't paged, so Prev/Next give way to one way back
+        self.prev_page_button.setVisible(not self._show_all)
+        self.next_page_button.setVisible(not self._show_all)
+        self.prev_page_button.setEnabled(self._page > 0)
+        self.next_page_button.setEnabled(self._page < page_count - 1)
+        self.show_all_button.setText(f"Chart all {len(self._full_results)} rows")
+        self.show_all_button.setVisible(page_count > 1 and not self._show_all)
+        self.back_to_pages_button.setVisible(self._show_all)
+    
+    def _render_page(self):
+        offset = self._page * self._page_size
+        self.data_visualizer.set_data(self._full_results[offset:offset + self._page_size])
+        self._update_page_controls()
+    
+    def _show_all_rows(self):
+        # Charts then cover every row; the table keeps its own display cap
+        logger.info("Charting all %d rows", len(self._full_results))
+        self._show_all = True
+        self.data_visualizer.set_data(self._full_results)
+        self._update_page_controls()
+    
+    def _back_to_pages(self):
+        # Return to the page that was last shown
+        self._show_all = False
+        self._render_page()
+    
+    def _change_page(self, delta):
+        page = self._page + delta
+        if page < 0 or page >= self._page_count():
+            return
+        self._page = page
+        self._render_page()
+    
     def show_templates(self):
         db_type = self.db_manager.db_config["type"]
-        dialog = TemplateManagerDialog(db_type, self)
-        dialog.template_selected.connect(self.apply_template)
-        dialog.exec()
+        if self._templates_dialog is None:
+            # Imported on first use; most sessions never open the templates dialog
+            from template_manager import TemplateManagerDialog
+            self._templates_dialog = TemplateManagerDialog(db_type, self)
+            self._templates_dialog.template_selected.connect(self.apply_template)
+        elif self._templates_dialog.db_type != db_type:
+            self._templates_dialog.set_db_type(db_type)
+        self._templates_dialog.exec()
     
     def apply_template(self, template):
         # Convert query to string if it's an object/array
         query_string = template["query"]
         if not isinstance(query_string, str):
-            query_string = json.dumps(query_string, indent=2)
+            query_string = json_utils.dumps(query_string, indent=True).decode("utf-8")
             
         self.query_editor.setPlainText(query_string)
-        self.query = query_string
         
         # Only update the database type from the template
         # while preserving the existing URL and tableName
@@ -366,76 +530,104 @@ class QueryBuilder(QMainWindow):
             self.db_manager.db_config["type"] = template["database_type"]
             
             # Update the UI to reflect the new database type
-            for display_name, internal_value in self.db_manager.db_type_map.items():
-                if internal_value == self.db_manager.db_config["type"]:
-                    self.db_type_combo.setCurrentText(display_name)
-                    break
+            display_name = self.db_manager.get_display_name()
+            if display_name:
+                self.db_type_combo.setCurrentText(display_name)
     
     def show_history(self):
-        dialog = QueryHistoryDialog(self)
-        dialog.query_selected.connect(self.apply_history_query)
-        dialog.exec()
+        if self._history_dialog is None:
+            self._history_dialog = QueryHistoryDialog(self, self.history_manager)
+            self._history_dialog.query_selected.connect(self.apply_history_query)
+        else:
+            # Pick up queries recorded since the dialog was last shown
+            self._history_dialog.refresh()
+        self._history_dialog.exec()
     
     def apply_history_query(self, query):
         self.query_editor.setPlainText(query)
-        self.query = query
     
     def save_query(self):
-        if not self.query.strip():
-            QMessageBox.warning(self, "Empty Query", "Please enter a query to save.")
+        query = self.query
+        if not query.strip():
+            self._notify(QMessageBox.Icon.Warning, "Empty Query", "Please enter a query to save.")
             return
         
         # Save to history
-        history_manager = QueryHistoryManager()
-        history_manager.add_query(self.query, self.db_manager.db_config["type"])
+        self.history_manager.add_query(query, self.db_manager.db_config["type"])
         
-        QMessageBox.information(self, "Save Query", "Query saved to history successfully!")
+        self._notify(QMessageBox.Icon.Information, "Save Query", "Query saved to history successfully!")
     
     def load_test_query(self):
         test_query = self.db_manager.get_test_query()
         self.query_editor.setPlainText(test_query)
-        self.query = test_query
         logger.info(f"Loaded test query for {self.db_manager.db_config['type']}")
         
     def export_logs(self):
         try:
-            logs_dir = pathlib.Path("logs")
-            if logs_dir.exists() and any(logs_dir.iterdir()):
+            # Buffered records must reach the file before it is copied
+            flush_logs()
+            log_files = []
+            if os.path.isdir("logs"):
+                # DirEntry caches its stat, so each file is stat'ed once
+                with os.scandir("logs") as entries:
+                    log_files = [e for e in entries if e.name.endswith(".log") and e.is_file()]
+            if log_files:
                 # Get the most recent log file
-                log_files = sorted(logs_dir.glob("*.log"), key=lambda x: x.stat().st_mtime, reverse=True)
-                if log_files:
-                    latest_log = log_files[0]
-                    
-                    # Ask user where to save the log file
-                    file_dialog = QFileDialog()
-                    save_path, _ = file_dialog.getSaveFileName(
-                        self, 
-                        "Save Log File", 
-                        f"querybuilder_log_{datetime.now().strftime('%Y%m%d')}.log",
-                        "Log Files (*.log);;All Files (*)"
-                    )
-                    
-                    if save_path:
-                        # Copy the log file to the selected location
-                        with open(latest_log, 'r') as src, open(save_path, 'w') as dst:
-                            dst.write(src.read())
-                        logger.info(f"Exported log file to: {save_path}")
-                        QMessageBox.information(self, "Log Export", f"Log file exported to: {save_path}")
-                else:
-                    QMessageBox.warning(self, "No Logs", "No log files found to export.")
+                latest_log = max(log_files, key=lambda e: e.stat().st_mtime).path
+                
+                # Ask user where to save the log file
+                file_dialog = QFileDialog()
+                save_path, _ = file_dialog.getSaveFileName(
+                    self, 
+                    "Save Log File", 
+                    f"querybuilder_log_{datetime.now().strftime('%Y%m%d')}.log",
+                    "Log Files (*.log);;All Files (*)"
+                )
+                
+                if save_path:
+                    # Copy the log file to the selected location without
+                    # reading it into memory
+                    shutil.copyfile(latest_log, save_path)
+                    logger.info(f"Exported log file to: {save_path}")
+                    self._notify(QMessageBox.Icon.Information, "Log Export", f"Log file exported to: {save_path}")
             else:
-                QMessageBox.warning(self, "No Logs", "No log files found to export.")
+                self._notify(QMessageBox.Icon.Warning, "No Logs", "No log files found to export.")
         except Exception as e:
             logger.error(f"Error exporting logs: {str(e)}", exc_info=True)
-            QMessageBox.critical(self, "Export Error", f"Error exporting logs: {str(e)}")
+            self._notify(QMessageBox.Icon.Critical, "Export Error", f"Error exporting logs: {str(e)}")
             
     def run_test_query(self):
-        try:
-            data = self.api_client.run_test_query()
-            QMessageBox.information(
-                self,
-                "Test Query Result",
-                f"Test query executed successfully. Check logs for details."
-            )
-        except Exception as e:
-            QMessageBox.critical(self, "Test Connection Error", str(e))
+        # Run the request on a pool thread so the window stays responsive
+        self.test_api_button.setEnabled(False)
+        worker = ApiWorker(self.api_client.run_test_query)
+        worker.signals.finished.connect(self._on_test_query_finished)
+        worker.signals.failed.connect(self._on_test_query_failed)
+        self.pool.start(worker)
+    
+    def _on_test_query_finished(self, data):
+        self.test_api_button.setEnabled(True)
+        self._notify(
+            QMessageBox.Icon.Information,
+            "Test Query Result",
+            f"Test query executed successfully. Check logs for details."
+        )
+    
+    def _on_test_query_failed(self, error):
+        self.test_api_button.setEnabled(True)
+        self._notify(QMessageBox.Icon.Critical, "Test Connection Error", error)
+    
+    def _notify(self, icon, title, text):
+        # One message box is built on first use and reused for every popup
+        box = self._msgbox
+        if box is None:
+            box = self._msgbox = QMessageBox(self)
+        elif box.isVisible():
+            # Worker results can arrive while the shared box is still open;
+            # give this message its own box rather than re-entering exec()
+            box = QMessageBox(self)
+        box.setIcon(icon)
+        box.setWindowTitle(title)
+        box.setText(text)
+        box.exec()
+        if box is not self._msgbox:
+            box.deleteLater()
@@ -1,30 +1,121 @@
 import sys
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QTabWidget, QTableWidget, QTableWidgetItem, QMessageBox,
+    QTabWidget, QTableView, QHeaderView, QMessageBox,
     QComboBox, QApplication
 )
-from PyQt6.QtCore import Qt
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import pandas as pd
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
 
+# matplotlib, numpy and pandas are imported where they are first needed so
+# that loading this module does not pay their import cost at startup
 
-class MplCanvas(FigureCanvas):
+
+class MplCanvas(QWidget):
     """Matplotlib canvas for embedding charts in Qt"""
-    def __init__(self, width=5, height=4, dpi=100):
-        self.fig = Figure(figsize=(width, height), dpi=dpi)
+    def __init__(self, width=5, height=4, dpi=100, parent=None):
+        super().__init__(parent)
+        try:
+            # Binding-agnostic backend; follows whichever Qt is already loaded
+            from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+        except ImportError:
+            from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+        from matplotlib.figure import Figure
+        
+        # constrained_layout adjusts spacing at draw time, so no tight_layout passes
+        self.fig = Figure(figsize=(width, height), dpi=dpi, constrained_layout=True)
         self.axes = self.fig.add_subplot(111)
-        super().__init__(self.fig)
-        self.fig.tight_layout()
+        self._canvas = FigureCanvasQTAgg(self.fig)
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self._canvas)
+        
+    def draw(self):
+        self._canvas.draw()
+        
+    def draw_idle(self):
+        self._canvas.draw_idle()
+
+
+class DataFrameModel(QAbstractTableModel):
+    """Table model that reads cells from a DataFrame on demand"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._df = None
+        self._columns = []
+        self._headers = []
+        self._isna = None
+
+    def set_dataframe(self, df):
+        """Swap the backing DataFrame and reset attached views"""
+        self.beginResetModel()
+        self._df = df
+        # Pull each column out as an ndarray once so cell lookups skip
+        # pandas' per-call indexing overhead
+        self._columns = [] if df is None else [df.iloc[:, i].to_numpy() for i in range(df.shape[1])]
+        self._headers = [] if df is None else [str(c) for c in df.columns]
+        if df is not None and self._isna is None:
+            import pandas as pd
+            self._isna = pd.isna
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if self._df is None or parent.isValid():
+            return 0
+        return self._df.shape[0]
+
+    def columnCount(self, parent=QModelIndex()):
+        if self._df is None or parent.isValid():
+            return 0
+        return self._df.shape[1]
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        value = self._columns[index.column()][index.row()]
+        # Convert to string for display, leaving missing values blank
+        if value is None or (not hasattr(value, "__len__") and self._isna(value)):
+            return ""
+        return str(value)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or self._df is None:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self._headers[section]
+        return str(section + 1)
 
 
 class DataVisualizer(QWidget):
+    # Upper bound on rows handed to the table view; charts still use all rows
+    MAX_DISPLAY_ROWS = 500
+    # Pie charts lump everything beyond the largest slices into "Other"
+    MAX_PIE_SLICES = 20
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.data = None
         self.df = None
+        self._df_display = None
+        self._all_cols = []
+        self._numeric_cols = []
+        # Column lists the axis selectors were last populated from
+        self._last_all_cols = None
+        self._last_numeric_cols = None
+        
+        # Line/scatter artist kept between redraws so it can be updated in place
+        self._chart_artist = None
+        self._chart_artist_type = None
+        self._chart_x_column = None
+        
+        # Grouped bar/pie series keyed by (chart_type, x_column, y_column)
+        self._agg_cache = {}
+        
+        # Coalesce bursts of combo-box changes into a single redraw
+        self._chart_timer = QTimer(self)
+        self._chart_timer.setSingleShot(True)
+        self._chart_timer.timeout.connect(self._do_update_chart)
+        
         self.init_ui()
         
     def init_ui(self):
@@ -49,13 +140,24 @@ class DataVisualizer(QWidget):
         # Tab widget for different views
         self.tabs = QTabWidget()
         
-        # Table view
-        self.table_view = QTableWidget()
+        # Table view backed by a model so only visible cells are rendered
+        self.table_model = DataFrameModel(self)
+        self.table_view = QTableView()
+        self.table_view.setModel(self.table_model)
+        self.table_view.setSortingEnabled(False)
+        
+        # Fixed row heights and column sizing sampled from the first rows only,
+        # so sizing cost doesn't grow with the result set
+        header = self.table_view.horizontalHeader()
+        header.setDefaultSectionSize(120)
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.setResizeContentsPrecision(50)
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
         self.tabs.addTab(self.table_view, "Table")
         
         # Chart view
         self.chart_widget = QWidget()
-        chart_layout = QVBoxLayout(self.chart_widget)
+        self._chart_layout = QVBoxLayout(self.chart_widget)
         
         # Chart type selector
         chart_controls = QHBoxLayout()
@@ -75,11 +177,10 @@ class DataVisualizer(QWidget):
         chart_controls.addWidget(QLabel("Y Axis:"))
         chart_controls.addWidget(self.y_axis)
         
-        chart_layout.addLayout(chart_controls)
+        self._chart_layout.addLayout(chart_controls)
         
-        # Matplotlib canvas
-        self.canvas = MplCanvas(width=5, height=4, dpi=100)
-        chart_layout.addWidget(self.canvas)
+        # Matplotlib canvas, created on first chart draw
+        self.canvas = None
         
         self.tabs.addTab(self.chart_widget, "Chart")
         
@@ -91,22 +192,55 @@ class DataVisualizer(QWidget):
     def on_view_changed(self, index):
         self.tabs.setCurrentIndex(index)
         
+    def _ensure_canvas(self):
+        """Create the matplotlib canvas the first time a chart is drawn"""
+        if self.canvas is None:
+            self.canvas = MplCanvas(width=5, height=4, dpi=100)
+            self._chart_layout.addWidget(self.canvas)
+        return self.canvas
+        
     def set_data(self, data):
+        import pandas as pd
+        
         # Handle the API response format which returns data in a 'data' field
         if isinstance(data, dict) and 'data' in data:
             self.data = data['data']
         else:
             self.data = data
         
-        if not self.data or not isinstance(self.data, list) or len(self.data) == 0:
+        # Columnar results (dict of equal-length lists) build in a single pass
+        is_columnar = (
+            isinstance(self.data, dict)
+            and bool(self.data)
+            and all(isinstance(v, list) for v in self.data.values())
+        )
+        
+        if not is_columnar and (not self.data or not isinstance(self.data, list) or len(self.data) == 0):
+            # Drop the old frame so the kept axis selectors can't redraw stale results
+            self.df = None
             self.clear_views()
             return
             
         # Convert to pandas DataFrame for easier manipulation
-        self.df = pd.DataFrame(self.data)
+        if is_columnar:
+            self.df = pd.DataFrame(self.data, copy=False)
+        elif isinstance(self.data[0], dict):
+            self.df = pd.DataFrame.from_records(self.data)
+        else:
+            self.df = pd.DataFrame(self.data)
+        self._all_cols = self.df.columns.tolist()
+        self._numeric_cols = self.df.select_dtypes(include='number').columns.tolist()
+        self._shrink_dtypes()
+        self._agg_cache = {}
+        # Bar groups depend on the data, so a new result can't reuse the bars
+        self._chart_x_column = None
+        self._df_display = self.df.head(self.MAX_DISPLAY_ROWS)
         
         # Update row count label
-        self.row_count_label.setText(f"{len(self.data)} rows")
+        if len(self._df_display) < len(self.df):
+            self.row_count_label.setText(f"showing {len(self._df_display)} of {len(self.df)} rows")
+        else:
+            self.row_count_label.setText(f"{len(self.df)} rows")
         
         # Update table view
         self.update_table()
@@ -115,27 +249,47 @@ class DataVisualizer(QWidget):
         self.update_axis_selectors()
         
         # Update chart if we have numeric columns
-        numeric_columns = self.df.select_dtypes(include=['number']).columns.tolist()
-        if len(numeric_columns) >= 2:
+        if len(self._numeric_cols) >= 2:
             self.tabs.setTabEnabled(1, True)
             self.update_chart()
         else:
             self.tabs.setTabEnabled(1, False)
             
+    def _shrink_dtypes(self):
+        """Downcast integer columns and categorize repetitive text columns"""
+        import pandas as pd
+        
+        for column in self._numeric_cols:
+            series = self.df[column]
+            # Integers downcast losslessly; floats stay float64 so displayed values aren't rounded
+            if pd.api.types.is_integer_dtype(series):
+                self.df[column] = pd.to_numeric(series, downcast='integer')
+            
+        for column in self._all_cols:
+            series = self.df[column]
+            if column in self._numeric_cols or not pd.api.types.is_string_dtype(series):
+                continue
+            try:
+                if series.nunique() <= len(series) // 2:
+                    self.df[column] = series.astype('category')
+            except TypeError:
+                # Unhashable cell values (nested JSON) can't be categorized
+                continue
+            
     def clear_views(self):
         """Clear all views"""
         # Clear table
-        self.table_view.clear()
-        self.table_view.setRowCount(0)
-        self.table_view.setColumnCount(0)
+        self.table_model.set_dataframe(None)
         
         # Clear chart
-        self.canvas.axes.clear()
-        self.canvas.draw()
+        if self.canvas is not None:
+            self.canvas.axes.clear()
+            self.canvas.draw_idle()
+        self._chart_artist = None
+        self._chart_artist_type = None
         
-        # Clear axis selectors
-        self.x_axis.clear()
-        self.y_axis.clear()
+        # Axis selectors are kept: the window clears results before every run, and
+        # a re-run with the same columns should keep the user's axis choice
         
     def update_table(self):
         """Update the table view with current data"""
@@ -143,49 +297,39 @@ class DataVisualizer(QWidget):
             self.clear_views()
             return
             
-        # Get headers
-        headers = self.df.columns.tolist()
-        
-        # Set up table
-        self.table_view.setRowCount(len(self.df))
-        self.table_view.setColumnCount(len(headers))
-        self.table_view.setHorizontalHeaderLabels(headers)
-        
-        # Populate table
-        for row_idx, (_, row) in enumerate(self.df.iterrows()):
-            for col_idx, header in enumerate(headers):
-                value = row[header]
-                # Convert to string for display
-                if value is None:
-                    display_value = ""
-                else:
-                    display_value = str(value)
-                    
-                item = QTableWidgetItem(display_value)
-                self.table_view.setItem(row_idx, col_idx, item)
-                
-        # Resize columns to content
+        # The model reads cells lazily, so no per-cell items are built here
+        self.table_view.setUpdatesEnabled(False)
+        self.table_model.set_dataframe(self._df_display)
         self.table_view.resizeColumnsToContents()
+        self.table_view.setUpdatesEnabled(True)
         
     def update_axis_selectors(self):
         """Update the axis selectors with available columns"""
         if self.df is None:
             return
+        
+        # Re-running a query usually yields the same columns; keep the combos as-is
+        if self._all_cols == self._last_all_cols and self._numeric_cols == self._last_numeric_cols:
+            return
             
         # Save current selections if possible
         current_x = self.x_axis.currentText() if self.x_axis.count() > 0 else ""
         current_y = self.y_axis.currentText() if self.y_axis.count() > 0 else ""
         
+        # Block signals while repopulating so each mutation doesn't redraw
+        self.x_axis.blockSignals(True)
+        self.y_axis.blockSignals(True)
+        
         # Clear selectors
         self.x_axis.clear()
         self.y_axis.clear()
         
         # All columns for X axis
-        all_columns = self.df.columns.tolist()
+        all_columns = self._all_cols
         self.x_axis.addItems(all_columns)
         
         # Only numeric columns for Y axis
-        numeric_columns = self.df.select_dtypes(include=['number']).columns.tolist()
+        numeric_columns = self._numeric_cols
         self.y_axis.addItems(numeric_columns)
         
         # Restore selections if possible
@@ -196,8 +340,18 @@ class DataVisualizer(QWidget):
             self.y_axis.setCurrentText(current_y)
         elif numeric_columns:
             self.y_axis.setCurrentText(numeric_columns[0])
+        
+        self.x_axis.blockSignals(False)
+        self.y_axis.blockSignals(False)
+        
+        self._last_all_cols = all_columns
+        self._last_numeric_cols = numeric_columns
             
     def update_chart(self):
+        """Schedule a chart redraw, collapsing rapid successive requests"""
+        self._chart_timer.start(50)
+        
+    def _do_update_chart(self):
         """Update the chart with current data and settings"""
         if self.df is None or self.df.empty:
             return
@@ -220,54 +374,80 @@ class DataVisualizer(QWidget):
             # Log the error and return
             print(f"Error: Selected columns {x_column}, {y_column} not found in DataFrame with columns {list(self.df.columns)}")
             return
-            
-        # Clear previous chart
-        self.canvas.axes.clear()
         
+        import pandas as pd
+        self._ensure_canvas()
+            
         try:
+            # Line and scatter charts over a numeric x axis, and bar charts over
+            # the same x column, keep their artists so only the data is swapped
+            reusable = pd.api.types.is_numeric_dtype(self.df[x_column])
+            if self._chart_artist is not None and chart_type == self._chart_artist_type:
+                if chart_type == "Bar Chart" and x_column == self._chart_x_column:
+                    self._update_chart_artist(x_column, y_column)
+                    return
+                if chart_type != "Bar Chart" and reusable:
+                    self._update_chart_artist(x_column, y_column)
+                    return
+            
+            # Clear previous chart
+            self.canvas.axes.clear()
+            self._chart_artist = None
+            self._chart_artist_type = None
+            
             # Create chart based on type
             if chart_type == "Bar Chart":
-                # Use matplotlib directly instead of pandas plot
-                self.canvas.axes.bar(
-                    self.df[x_column].astype(str),
-                    self.df[y_column]
+                # One bar per distinct x value rather than one per row
+                bar_data = self._aggregate(chart_type, x_column, y_column)
+                self._chart_artist = self.canvas.axes.bar(
+                    bar_data.index.to_numpy(),
+                    bar_data.to_numpy()
                 )
                 self.canvas.axes.set_xlabel(x_column)
                 self.canvas.axes.set_ylabel(y_column)
             elif chart_type == "Line Chart":
-                self.canvas.axes.plot(
-                    self.df[x_column],
-                    self.df[y_column]
+                line, = self.canvas.axes.plot(
+                    self.df[x_column].to_numpy(),
+                    self.df[y_column].to_numpy()
                 )
+                if reusable:
+                    self._chart_artist = line
                 self.canvas.axes.set_xlabel(x_column)
                 self.canvas.axes.set_ylabel(y_column)
             elif chart_type == "Scatter Plot":
-                self.canvas.axes.scatter(
-                    self.df[x_column],
-                    self.df[y_column]
+                points = self.canvas.axes.scatter(
+                    self.df[x_column].to_numpy(),
+                    self.df[y_column].to_numpy()
                 )
+                if reusable:
+                    self._chart_artist = points
                 self.canvas.axes.set_xlabel(x_column)
                 self.canvas.axes.set_ylabel(y_column)
             elif chart_type == "Pie Chart":
                 # For pie charts, we need to ensure values are positive
                 if (self.df[y_column] >= 0).all():
                     # Group by x_column and sum y_column values
-                    pie_data = self.df.groupby(x_column)[y_column].sum()
+                    pie_data = self._aggregate(chart_type, x_column, y_column)
                     self.canvas.axes.pie(
                         pie_data,
                         labels=pie_data.index,
                         autopct='%1.1f%%'
                     )
             
+            if self._chart_artist is not None:
+                self._chart_artist_type = chart_type
+                self._chart_x_column = x_column
+            
             # Set title
             self.canvas.axes.set_title(f"{y_column} by {x_column}")
             
-            # Adjust layout and redraw
-            self.canvas.fig.tight_layout()
-            self.canvas.draw()
+            # Schedule a redraw
+            self.canvas.draw_idle()
             
         except Exception as e:
             print(f"Error creating chart: {str(e)}")
+            self._chart_artist = None
+            self._chart_artist_type = None
             # Create a simple text message on the chart
             self.canvas.axes.text(
                 0.5, 0.5, 
@@ -276,7 +456,53 @@ class DataVisualizer(QWidget):
                 verticalalignment='center',
                 transform=self.canvas.axes.transAxes
             )
-            self.canvas.draw()
+            self.canvas.draw_idle()
+            
+    def _aggregate(self, chart_type, x_column, y_column):
+        """Sum y_column per distinct x_column value (string labels), cached per chart setting"""
+        key = (chart_type, x_column, y_column)
+        if key not in self._agg_cache:
+            import pandas as pd
+            agg = self.df.groupby(x_column, sort=False, observed=True)[y_column].sum()
+            if chart_type == "Pie Chart" and len(agg) > self.MAX_PIE_SLICES:
+                top = agg.nlargest(self.MAX_PIE_SLICES)
+                other = agg.drop(top.index).sum()
+                agg = pd.concat([top, pd.Series({"Other": other})])
+            # Labels are stringified once here instead of on every redraw
+            agg.index = agg.index.astype(str)
+            self._agg_cache[key] = agg
+        return self._agg_cache[key]
+        
+    def _update_chart_artist(self, x_column, y_column):
+        """Swap new data into the existing bar/line/scatter artist"""
+        import numpy as np
+        
+        axes = self.canvas.axes
+        
+        if self._chart_artist_type == "Bar Chart":
+            # Same x column means the same groups in the same order
+            heights = self._aggregate("Bar Chart", x_column, y_column).to_numpy()
+            for bar, height in zip(self._chart_artist, heights):
+                bar.set_height(height)
+            axes.relim()
+        elif self._chart_artist_type == "Line Chart":
+            x = self.df[x_column].to_numpy(dtype=float, na_value=np.nan)
+            y = self.df[y_column].to_numpy(dtype=float, na_value=np.nan)
+            self._chart_artist.set_data(x, y)
+            axes.relim()
+        else:
+            x = self.df[x_column].to_numpy(dtype=float, na_value=np.nan)
+            y = self.df[y_column].to_numpy(dtype=float, na_value=np.nan)
+            # relim() ignores collections, so reset the data limits by hand
+            self._chart_artist.set_offsets(np.column_stack((x, y)))
+            axes.ignore_existing_data_limits = True
+            axes.update_datalim(self._chart_artist.get_offsets())
+        axes.autoscale_view()
+        
+        axes.set_xlabel(x_column)
+        axes.set_ylabel(y_column)
+        axes.set_title(f"{y_column} by {x_column}")
+        self.canvas.draw_idle()
 
 
 # Test the component if run directly
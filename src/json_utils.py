@@ -0,0 +1,37 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data):
+    """
+    Parse a JSON document, using orjson when it is installed.
+
+    Args:
+        data (bytes | str): JSON text
+
+    Returns:
+        The decoded Python object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, indent=False):
+    """
+    Serialize an object to UTF-8 encoded JSON, using orjson when it is installed.
+
+    Args:
+        obj: Object to serialize
+        indent (bool): Pretty-print with two-space indentation
+
+    Returns:
+        bytes: Encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode("utf-8")
@@ -1,31 +1,84 @@
 import sys
+import atexit
+import queue
 import logging
+import logging.handlers
 import pathlib
 from datetime import datetime
 
+# Set by the first setup_logging() call and reused afterwards
+_logger = None
+_listener = None
+
 def setup_logging():
     """
     Configure and set up logging for the application.
-    
+
+    Safe to call more than once: later calls return the logger configured
+    by the first call instead of adding another set of handlers.
+
     Returns:
         logging.Logger: Configured logger instance
     """
+    global _logger, _listener
+    if _logger is not None:
+        return _logger
+
     logs_dir = pathlib.Path("logs")
     logs_dir.mkdir(exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_file = logs_dir / f"querybuilder_{timestamp}.log"
-    
+
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    # File records are queued and written by a background thread so logging
+    # never blocks the UI thread on disk I/O
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=5_000_000, backupCount=3
+    )
+    file_handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Pass the bare message through; the file handler applies the full format
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    _listener = logging.handlers.QueueListener(log_queue, file_handler)
+    _listener.start()
+    atexit.register(_shutdown, file_handler)
+
+    # Keep the console to warnings and errors
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    stream_handler.setLevel(logging.WARNING)
+
     # Configure logging
     logging.basicConfig(
         level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler(sys.stdout)
+            queue_handler,
+            stream_handler
         ]
     )
-    
+
     # Create logger
-    logger = logging.getLogger("QueryBuilder")
-    logger.info(f"Log file created at: {log_file}")
-    return logger
+    _logger = logging.getLogger("QueryBuilder")
+    _logger.info(f"Log file created at: {log_file}")
+    return _logger
+
+
+def _shutdown(file_handler):
+    """Write out queued records and close the log file at exit"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    file_handler.close()
+
+
+def flush_logs():
+    """Write any queued log records out to the log file"""
+    if _listener is not None:
+        # Stopping the listener drains the queue; start it again to keep logging
+        _listener.stop()
+        _listener.start()
+    for handler in logging.getLogger().handlers:
+        handler.flush()
@@ -1,20 +1,41 @@
-import json
+import atexit
+import functools
 import os
+import threading
+import uuid
+import json_utils
+from save_worker import save_file
+from collections import OrderedDict
 from datetime import datetime
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, 
     QListWidget, QListWidgetItem, QTextEdit, QMessageBox
 )
 from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtGui import QFont
+
+# Dialog header font, built once on first use; GUI objects must not be
+# created before the QApplication exists
+@functools.cache
+def _header_font():
+    font = QFont()
+    font.setPixelSize(16)
+    font.setBold(True)
+    return font
 
 class QueryHistoryItem:
     """Represents a single query history item"""
+    # History can hold hundreds of items, so skip the per-instance __dict__
+    __slots__ = ("id", "query", "db_type", "timestamp", "is_favorite", "_fmt_time")
+    
     def __init__(self, query, db_type, timestamp=None, is_favorite=False):
-        self.id = f"query_{int(datetime.now().timestamp())}"
+        self.id = uuid.uuid4().hex
         self.query = query
         self.db_type = db_type
         self.timestamp = timestamp or datetime.now().isoformat()
         self.is_favorite = is_favorite
+        # Formatted timestamp, parsed on first display and reused afterwards
+        self._fmt_time = None
     
     @classmethod
     def from_dict(cls, data):
@@ -40,83 +61,177 @@ class QueryHistoryItem:
     
     def __str__(self):
         """String representation for display"""
-        dt = datetime.fromisoformat(self.timestamp)
-        formatted_time = dt.strftime("%Y-%m-%d %H:%M:%S")
-        return f"{'★ ' if self.is_favorite else ''}{formatted_time} - {self.query[:50]}{'...' if len(self.query) > 50 else ''}"
+        if self._fmt_time is None:
+            self._fmt_time = datetime.fromisoformat(self.timestamp).strftime("%Y-%m-%d %H:%M:%S")
+        return f"{'★ ' if self.is_favorite else ''}{self._fmt_time} - {self.query[:50]}{'...' if len(self.query) > 50 else ''}"
 
 
 class QueryHistoryManager:
     """Manages query history"""
+    # Least recently used entries beyond this are dropped; favorites are always kept
+    MAX_ITEMS = 500
+    
     def __init__(self):
         self.history_file = "query_history.json"
-        self.history = self.load_history()
+        # Queries are recorded from worker threads while the dialog edits on the GUI thread
+        self._lock = threading.RLock()
+        # History is read from file on first use rather than at startup
+        self._items = None
+        self._by_query_key = {}
+        
+        # Mutations mark the history dirty and schedule one write once they settle.
+        # A threading.Timer is used because queries are recorded from pool threads.
+        self._dirty = False
+        self._save_timer = None
+        atexit.register(self.flush, True)
+    
+    def _reindex(self, items):
+        """Rebuild the id-ordered items and (db_type, query) lookup from a list, newest first"""
+        # Keyed by id, most recently used first
+        self._items = OrderedDict()
+        self._by_query_key = {}
+        for item in items:
+            # Older files used second-resolution ids, which can collide
+            if item.id in self._items:
+                item.id = uuid.uuid4().hex
+            self._items[item.id] = item
+            self._by_query_key.setdefault((item.db_type, item.query), item)
+    
+    def _ensure_loaded(self):
+        """Read the history file the first time the history is needed"""
+        with self._lock:
+            if self._items is None:
+                self._reindex(self.load_history())
+    
+    @property
+    def history(self):
+        """History items, most recent first"""
+        return self.get_history()
     
     def load_history(self):
         """Load history from file"""
         if os.path.exists(self.history_file):
             try:
-                with open(self.history_file, "r") as f:
-                    data = json.load(f)
-                    return [QueryHistoryItem.from_dict(item) for item in data]
+                with open(self.history_file, "rb") as f:
+                    data = json_utils.loads(f.read())
+                # Only the newest MAX_ITEMS entries and older favorites are kept,
+                # so don't build the rest
+                return [
+                    QueryHistoryItem.from_dict(item) for i, item in enumerate(data)
+                    if i < self.MAX_ITEMS or item.get("is_favorite", False)
+                ]
             except Exception as e:
                 print(f"Error loading history: {e}")
                 return []
         return []
     
-    def save_history(self):
-        """Save history to file"""
-        try:
-            with open(self.history_file, "w") as f:
-                data = [item.to_dict() for item in self.history]
-                json.dump(data, f, indent=2)
-        except Exception as e:
-            print(f"Error saving history: {e}")
+    def save_history(self, wait=False):
+        """Save history to file, on a pool thread unless wait is set"""
+        # Snapshot and queue under the lock so saves reach the pool in mutation order
+        with self._lock:
+            self._ensure_loaded()
+            data = [item.to_dict() for item in self._items.values()]
+            # Written compact: the file is machine-managed and indentation only adds bytes
+            save_file(self.history_file, json_utils.dumps(data), wait)
+    
+    def _schedule_save(self):
+        """Mark the history dirty and (re)start the delayed save"""
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(0.5, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def flush(self, wait=False):
+        """Write pending history changes now, on a pool thread unless wait is set"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+        self.save_history(wait)
     
     def add_query(self, query, db_type):
         """Add a query to history"""
-        # Check if this exact query already exists
-        for item in self.history:
-            if item.query == query and item.db_type == db_type:
+        with self._lock:
+            self._ensure_loaded()
+            # Check if this exact query already exists
+            item = self._by_query_key.get((db_type, query))
+            if item is not None:
                 # Move to top of history
-                self.history.remove(item)
-                self.history.insert(0, item)
-                self.save_history()
+                self._items.move_to_end(item.id, last=False)
+                self._schedule_save()
                 return item
-        
-        # Add new query
-        item = QueryHistoryItem(query, db_type)
-        self.history.insert(0, item)
-        self.save_history()
-        return item
+            
+            # Add new query
+            item = QueryHistoryItem(query, db_type)
+            self._items[item.id] = item
+            self._items.move_to_end(item.id, last=False)
+            self._by_query_key[(db_type, query)] = item
+            
+            # Evict the least recently used non-favorite once over the cap
+            if len(self._items) > self.MAX_ITEMS:
+                oldest = next((i for i in reversed(self._items.values()) if not i.is_favorite), None)
+                if oldest is not None:
+                    del self._items[oldest.id]
+                    self._forget_query_key(oldest)
+            
+            self._schedule_save()
+            return item
+    
+    def _forget_query_key(self, item):
+        """Drop item from the duplicate lookup if it is the entry recorded there"""
+        key = (item.db_type, item.query)
+        if self._by_query_key.get(key) is item:
+            del self._by_query_key[key]
     
     def toggle_favorite(self, query_id):
         """Toggle favorite status of a query"""
-        for item in self.history:
-            if item.id == query_id:
-                item.is_favorite = not item.is_favorite
-                self.save_history()
-                return item.is_favorite
-        return False
+        with self._lock:
+            self._ensure_loaded()
+            item = self._items.get(query_id)
+            if item is None:
+                return False
+            item.is_favorite = not item.is_favorite
+            self._schedule_save()
+            return item.is_favorite
     
     def delete_query(self, query_id):
         """Delete a query from history"""
-        self.history = [item for item in self.history if item.id != query_id]
-        self.save_history()
+        with self._lock:
+            self._ensure_loaded()
+            item = self._items.pop(query_id, None)
+            if item is None:
+                return
+            self._forget_query_key(item)
+            self._schedule_save()
+    
+    def get_by_id(self, query_id):
+        """Get a history item by id, or None if it is not in the history"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._items.get(query_id)
     
     def get_history(self, filter_favorites=False):
         """Get all history items, optionally filtered to favorites"""
-        if filter_favorites:
-            return [item for item in self.history if item.is_favorite]
-        return self.history
+        with self._lock:
+            self._ensure_loaded()
+            if filter_favorites:
+                return [item for item in self._items.values() if item.is_favorite]
+            return list(self._items.values())
 
 
 class QueryHistoryDialog(QDialog):
     """Dialog for viewing and managing query history"""
     query_selected = pyqtSignal(str)
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, history_manager=None):
         super().__init__(parent)
-        self.history_manager = QueryHistoryManager()
+        self.history_manager = history_manager or QueryHistoryManager()
         
         self.setWindowTitle("Query History")
         self.setMinimumSize(700, 500)
@@ -128,7 +243,7 @@ class QueryHistoryDialog(QDialog):
         
         # Header
         header = QLabel("Query History")
-        header.setStyleSheet("font-size: 16px; font-weight: bold;")
+        header.setFont(_header_font())
         layout.addWidget(header)
         
         # Filter controls
@@ -189,13 +304,23 @@ class QueryHistoryDialog(QDialog):
     
     def load_history(self, filter_favorites=False):
         """Load history items into the list widget"""
-        self.history_list.clear()
         history_items = self.history_manager.get_history(filter_favorites)
         
+        # Fill the list in one pass without repainting or signalling per row
+        self.history_list.setUpdatesEnabled(False)
+        self.history_list.blockSignals(True)
+        self.history_list.clear()
         for item in history_items:
             list_item = QListWidgetItem(str(item))
-            list_item.setData(Qt.ItemDataRole.UserRole, item.id)
+            list_item.setData(Qt.ItemDataRole.UserRole, item)
             self.history_list.addItem(list_item)
+        self.history_list.blockSignals(False)
+        self.history_list.setUpdatesEnabled(True)
+    
+    def refresh(self):
+        """Reset to all queries and reload the list from the history manager"""
+        self.query_preview.clear()
+        self.filter_history(False)
     
     def filter_history(self, show_favorites):
         """Filter history to show all or only favorites"""
@@ -205,13 +330,8 @@ class QueryHistoryDialog(QDialog):
     
     def on_item_clicked(self, item):
         """Handle click on a history item"""
-        query_id = item.data(Qt.ItemDataRole.UserRole)
-        history_items = self.history_manager.get_history()
-        
-        for history_item in history_items:
-            if history_item.id == query_id:
-                self.query_preview.setPlainText(history_item.query)
-                break
+        history_item = item.data(Qt.ItemDataRole.UserRole)
+        self.query_preview.setPlainText(history_item.query)
     
     def on_item_double_clicked(self, item):
         """Handle double-click on a history item"""
@@ -224,16 +344,12 @@ class QueryHistoryDialog(QDialog):
             return
             
         item = selected_items[0]
-        query_id = item.data(Qt.ItemDataRole.UserRole)
+        history_item = item.data(Qt.ItemDataRole.UserRole)
         
-        is_favorite = self.history_manager.toggle_favorite(query_id)
+        self.history_manager.toggle_favorite(history_item.id)
         
         # Update the item text
-        history_items = self.history_manager.get_history()
-        for history_item in history_items:
-            if history_item.id == query_id:
-                item.setText(str(history_item))
-                break
+        item.setText(str(history_item))
     
     def delete_query(self):
         """Delete selected query from history"""
@@ -242,7 +358,7 @@ class QueryHistoryDialog(QDialog):
             return
             
         item = selected_items[0]
-        query_id = item.data(Qt.ItemDataRole.UserRole)
+        history_item = item.data(Qt.ItemDataRole.UserRole)
         
         reply = QMessageBox.question(
             self, 
@@ -252,11 +368,16 @@ class QueryHistoryDialog(QDialog):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            self.history_manager.delete_query(query_id)
+            self.history_manager.delete_query(history_item.id)
             row = self.history_list.row(item)
             self.history_list.takeItem(row)
             self.query_preview.clear()
     
+    def done(self, result):
+        # Persist favorite/delete edits as the dialog closes
+        self.history_manager.flush()
+        super().done(result)
+    
     def use_query(self):
         """Use the selected query"""
         selected_items = self.history_list.selectedItems()
@@ -264,11 +385,6 @@ class QueryHistoryDialog(QDialog):
             return
             
         item = selected_items[0]
-        query_id = item.data(Qt.ItemDataRole.UserRole)
-        
-        history_items = self.history_manager.get_history()
-        for history_item in history_items:
-            if history_item.id == query_id:
-                self.query_selected.emit(history_item.query)
-                self.accept()
-                break
+        history_item = item.data(Qt.ItemDataRole.UserRole)
+        self.query_selected.emit(history_item.query)
+        self.accept()
@@ -0,0 +1,67 @@
+import logging
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+logger = logging.getLogger("QueryBuilder")
+
+
+class WorkerSignals(QObject):
+    """Signals emitted by workers back to the GUI thread"""
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+
+class ApiWorker(QRunnable):
+    """Runs a blocking API client call on a thread pool thread"""
+    def __init__(self, func, *args):
+        """
+        Initialize the worker.
+
+        Args:
+            func (callable): Blocking call to run, e.g. an ApiClient method
+            *args: Positional arguments passed to func
+        """
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            data = self.func(*self.args)
+        except Exception as e:
+            logger.error(f"Error in API call: {str(e)}", exc_info=True)
+            self.signals.failed.emit(str(e))
+            return
+
+        self.on_success(data)
+        self.signals.finished.emit(data)
+
+    def on_success(self, data):
+        """Hook run on the worker thread after a successful call"""
+        pass
+
+
+class QueryWorker(ApiWorker):
+    """Runs a query through the API client on a thread pool thread"""
+    def __init__(self, api_client, history_manager, query, db_config, read_only=True):
+        """
+        Initialize the worker.
+
+        Args:
+            api_client (ApiClient): Client used to execute the query
+            history_manager (QueryHistoryManager): Shared history the query is recorded in
+            query (str): The query to execute
+            db_config (dict): Database configuration snapshot
+            read_only (bool): Whether the query is read-only
+        """
+        super().__init__(api_client.execute_query, query, db_config, read_only)
+        self.history_manager = history_manager
+        self.query = query
+        self.db_config = db_config
+
+    def on_success(self, data):
+        # Record the query here so history file I/O stays off the GUI thread
+        try:
+            self.history_manager.add_query(self.query, self.db_config["type"])
+        except Exception as e:
+            logger.error(f"Error saving query to history: {str(e)}", exc_info=True)
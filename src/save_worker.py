@@ -0,0 +1,65 @@
+import itertools
+import logging
+import os
+from PyQt6.QtCore import QMutex, QMutexLocker, QRunnable, QThreadPool
+
+logger = logging.getLogger("QueryBuilder")
+
+# Serializes file writes across pool threads so files are never torn
+_write_mutex = QMutex()
+# Sequence numbers let a write skip itself once a newer snapshot of its file has landed
+_job_counter = itertools.count()
+_written_seq = {}
+
+
+class SaveJob(QRunnable):
+    """Atomically writes a serialized snapshot to a file on a thread pool thread"""
+    def __init__(self, path, data, on_failed=None):
+        """
+        Initialize the job.
+
+        Args:
+            path (str): File to replace
+            data (bytes): Complete new file contents, serialized on the calling thread
+            on_failed (callable): Called with no arguments if the file could not be written
+        """
+        super().__init__()
+        self.path = path
+        self.data = data
+        self.on_failed = on_failed
+        self.seq = next(_job_counter)
+
+    def run(self):
+        with QMutexLocker(_write_mutex):
+            # Pool threads can run jobs out of order; never replace a newer snapshot
+            if _written_seq.get(self.path, -1) > self.seq:
+                return
+            try:
+                # Write to a temp file and swap it in so a crash can't truncate the file
+                tmp_file = self.path + ".tmp"
+                with open(tmp_file, "wb") as f:
+                    f.write(self.data)
+                os.replace(tmp_file, self.path)
+                _written_seq[self.path] = self.seq
+                logger.info("Saved %s", self.path)
+            except Exception as e:
+                logger.error("Error saving %s: %s", self.path, e)
+                if self.on_failed is not None:
+                    self.on_failed()
+
+
+def save_file(path, data, wait=False, on_failed=None):
+    """
+    Write data to path atomically, in the background unless asked to wait.
+
+    Args:
+        path (str): File to replace
+        data (bytes): Complete new file contents
+        wait (bool): Write on the calling thread before returning, e.g. at exit
+        on_failed (callable): Called on the writing thread if the write fails
+    """
+    job = SaveJob(path, data, on_failed)
+    if wait:
+        job.run()
+    else:
+        QThreadPool.globalInstance().start(job)
@@ -1,14 +1,21 @@
-import json
+import atexit
+import functools
 import os
+import uuid
+from collections import defaultdict
+from types import MappingProxyType
+import json_utils
+from save_worker import save_file
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QTextEdit,
     QPushButton, QListWidget, QListWidgetItem, QFormLayout, QMessageBox
 )
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, QObject, QTimer, pyqtSignal
+from PyQt6.QtGui import QFont
 
-# Default templates similar to the web version
-DEFAULT_TEMPLATES = [
-    {
+# Default templates similar to the web version, read-only so callers get copies
+DEFAULT_TEMPLATES = (
+    MappingProxyType({
         "id": "template_1",
         "name": "Select All Records",
         "description": "Retrieve all records from a table",
@@ -16,8 +23,8 @@ DEFAULT_TEMPLATES = [
         "category": "Basic",
         "database_type": "postgres",
         "is_public": True
-    },
-    {
+    }),
+    MappingProxyType({
         "id": "template_2",
         "name": "Count Records",
         "description": "Count the number of records in a table",
@@ -25,8 +32,8 @@ DEFAULT_TEMPLATES = [
         "category": "Basic",
         "database_type": "postgres",
         "is_public": True
-    },
-    {
+    }),
+    MappingProxyType({
         "id": "template_3",
         "name": "Find MongoDB Documents",
         "description": "Find documents in a MongoDB collection",
@@ -34,8 +41,17 @@ DEFAULT_TEMPLATES = [
         "category": "Basic",
         "database_type": "mongodb",
         "is_public": True
-    }
-]
+    })
+)
+
+# Dialog header font, built once on first use; GUI objects must not be
+# created before the QApplication exists
+@functools.cache
+def _header_font():
+    font = QFont()
+    font.setPixelSize(16)
+    font.setBold(True)
+    return font
 
 class TemplateDialog(QDialog):
     """Dialog for creating or editing a query template"""
@@ -44,7 +60,7 @@ class TemplateDialog(QDialog):
     def __init__(self, template=None, parent=None):
         super().__init__(parent)
         self.template = template or {
-            "id": f"template_{id(self)}",
+            "id": f"template_{uuid.uuid4().hex}",
             "name": "",
             "description": "",
             "query": "",
@@ -118,53 +134,113 @@ class TemplateDialog(QDialog):
         self.accept()
 
 
-class TemplateManager:
+class TemplateManager(QObject):
     """Manages query templates"""
+    # Emitted after a template is added, updated or deleted
+    changed = pyqtSignal()
+    
     def __init__(self):
+        super().__init__()
         self.templates_file = "templates.json"
-        self.templates = self.load_templates()
+        # Templates are read from file on first use rather than at construction
+        self._templates = None
+        self._by_id = {}
+        self._by_dbtype = defaultdict(list)
+        
+        # Saves are coalesced: rapid edits produce one write once they settle
+        self._dirty = False
+        self._flush_timer = QTimer()
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(500)
+        self._flush_timer.timeout.connect(self.flush_templates)
+        atexit.register(self.flush_templates, True)
+    
+    def _ensure_loaded(self):
+        """Read the templates file the first time templates are needed"""
+        if self._templates is None:
+            self._templates = self.load_templates()
+            self._reindex()
+    
+    @property
+    def templates(self):
+        """All templates, loaded on first access"""
+        self._ensure_loaded()
+        return self._templates
+    
+    def _reindex(self):
+        """Rebuild the id and database type lookups from the template list"""
+        self._by_id = {t["id"]: t for t in self._templates}
+        self._by_dbtype = defaultdict(list)
+        for template in self._templates:
+            self._by_dbtype[template["database_type"]].append(template)
         
     def load_templates(self):
         """Load templates from file or use defaults"""
         if os.path.exists(self.templates_file):
             try:
-                with open(self.templates_file, "r") as f:
-                    return json.load(f)
+                with open(self.templates_file, "rb") as f:
+                    return json_utils.loads(f.read())
             except Exception as e:
                 print(f"Error loading templates: {e}")
-                return DEFAULT_TEMPLATES
-        return DEFAULT_TEMPLATES
+                return [dict(t) for t in DEFAULT_TEMPLATES]
+        return [dict(t) for t in DEFAULT_TEMPLATES]
     
     def save_templates(self):
-        """Save templates to file"""
-        try:
-            with open(self.templates_file, "w") as f:
-                json.dump(self.templates, f, indent=2)
-        except Exception as e:
-            print(f"Error saving templates: {e}")
+        """Schedule a write of the templates once edits settle"""
+        self._dirty = True
+        self._flush_timer.start()
+    
+    def flush_templates(self, wait=False):
+        """Write pending template changes now, on a pool thread unless wait is set"""
+        self._flush_timer.stop()
+        if not self._dirty:
+            return
+        self._dirty = False
+        save_file(self.templates_file, json_utils.dumps(self.templates, indent=True), wait)
     
     def add_template(self, template):
         """Add a new template"""
         self.templates.append(template)
+        self._by_id[template["id"]] = template
+        self._by_dbtype[template["database_type"]].append(template)
         self.save_templates()
+        self.changed.emit()
     
     def update_template(self, updated_template):
         """Update an existing template"""
-        for i, template in enumerate(self.templates):
-            if template["id"] == updated_template["id"]:
-                self.templates[i] = updated_template
-                self.save_templates()
-                return True
-        return False
+        self._ensure_loaded()
+        template = self._by_id.get(updated_template["id"])
+        if template is None:
+            return False
+        # Update in place so the list and both lookups keep pointing at the same dict
+        old_db_type = template["database_type"]
+        template.update(updated_template)
+        if template["database_type"] != old_db_type:
+            self._by_dbtype[old_db_type].remove(template)
+            self._by_dbtype[template["database_type"]].append(template)
+        self.save_templates()
+        self.changed.emit()
+        return True
     
     def delete_template(self, template_id):
         """Delete a template by ID"""
-        self.templates = [t for t in self.templates if t["id"] != template_id]
+        self._ensure_loaded()
+        template = self._by_id.pop(template_id, None)
+        if template is not None:
+            self._templates.remove(template)
+            self._by_dbtype[template["database_type"]].remove(template)
         self.save_templates()
+        self.changed.emit()
     
     def get_templates_by_db_type(self, db_type):
         """Get templates filtered by database type"""
-        return [t for t in self.templates if t["database_type"] == db_type]
+        self._ensure_loaded()
+        return list(self._by_dbtype.get(db_type, ()))
+    
+    def get_template(self, template_id):
+        """Get a template by ID, or None if there is no such template"""
+        self._ensure_loaded()
+        return self._by_id.get(template_id)
 
 
 class TemplateManagerDialog(QDialog):
@@ -175,18 +251,26 @@ class TemplateManagerDialog(QDialog):
         super().__init__(parent)
         self.db_type = db_type
         self.template_manager = TemplateManager()
+        # Templates for db_type, refreshed only when the templates change
+        self._filtered = []
+        self.template_manager.changed.connect(self._refresh_templates)
         
         self.setWindowTitle("Query Templates")
         self.setMinimumSize(600, 400)
         self.init_ui()
-        self.load_templates()
+        self._refresh_templates()
+    
+    def done(self, result):
+        # Persist template edits as the dialog closes
+        self.template_manager.flush_templates()
+        super().done(result)
         
     def init_ui(self):
         layout = QVBoxLayout(self)
         
         # Header
         header = QLabel("Query Templates")
-        header.setStyleSheet("font-size: 16px; font-weight: bold;")
+        header.setFont(_header_font())
         layout.addWidget(header)
         
         # Template list
@@ -217,12 +301,21 @@ class TemplateManagerDialog(QDialog):
         
         layout.addLayout(button_layout)
         
+    def set_db_type(self, db_type):
+        """Switch the dialog to the templates for another database type"""
+        self.db_type = db_type
+        self._refresh_templates()
+    
+    def _refresh_templates(self):
+        """Re-filter templates for db_type and reload the list"""
+        self._filtered = self.template_manager.get_templates_by_db_type(self.db_type)
+        self.load_templates()
+        
     def load_templates(self):
         """Load templates into the list widget"""
         self.template_list.clear()
-        templates = self.template_manager.get_templates_by_db_type(self.db_type)
         
-        for template in templates:
+        for template in self._filtered:
             item = QListWidgetItem(template["name"])
             item.setData(Qt.ItemDataRole.UserRole, template)
             self.template_list.addItem(item)
@@ -236,7 +329,7 @@ class TemplateManagerDialog(QDialog):
     def create_template(self):
         """Create a new template"""
         new_template = {
-            "id": f"template_{id(self)}",
+            "id": f"template_{uuid.uuid4().hex}",
             "name": "",
             "description": "",
             "query": "",
@@ -282,17 +375,11 @@ class TemplateManagerDialog(QDialog):
         
         if reply == QMessageBox.StandardButton.Yes:
             self.template_manager.delete_template(template["id"])
-            self.load_templates()
     
     def on_template_saved(self, template):
         """Handle template save event"""
         # Check if this is a new template or update
-        templates = self.template_manager.get_templates_by_db_type(self.db_type)
-        existing = next((t for t in templates if t["id"] == template["id"]), None)
-        
-        if existing:
+        if self.template_manager.get_template(template["id"]) is not None:
             self.template_manager.update_template(template)
         else:
             self.template_manager.add_template(template)
-            
-        self.load_templates()